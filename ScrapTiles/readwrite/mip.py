@@ -1,4 +1,7 @@
-import struct
+import numpy as np
+
+# Each vertex is a float32 height followed by a uint32 colour
+VERTEX_DTYPE = np.dtype([("height", "<f4"), ("color", "<u4")])
 
 def infer_dimensions(size):
     # Total size = (vertex_count * 8) + (ground_count * 8)
@@ -21,35 +24,23 @@ def infer_dimensions(size):
     raise ValueError("Could not infer dimensions")
 
 def read_mip(decompressed_data, metadata, version=13):
-    height_map = []
-    color_map = []
-    ground_map = []
-
     vertex_dim, ground_dim = infer_dimensions(metadata["size"])
     wh = vertex_dim * vertex_dim
     ground_count = ground_dim * ground_dim
 
     # Read height/color data
-    for i in range(wh):
-        offset = i * 8
-        height = struct.unpack_from("<f", decompressed_data, offset)[0]
-        color = struct.unpack_from("<I", decompressed_data, offset + 4)[0]
-        height_map.append(height)
-        color_map.append(color)
+    vertices = np.frombuffer(decompressed_data, dtype=VERTEX_DTYPE, count=wh)
 
     # Read ground map
     ground_offset = wh * 8
-    for i in range(ground_count):
-        offset = ground_offset + i * 8
-        val = struct.unpack_from("<q", decompressed_data, offset)[0]
-        ground_map.append(val)
+    ground_map = np.frombuffer(decompressed_data, dtype="<i8", count=ground_count, offset=ground_offset)
 
     return {
         "vertex_dim": vertex_dim,
         "ground_dim": ground_dim,
-        "height_map": height_map,
-        "color_map": color_map,
-        "ground_map": ground_map,
+        "height_map": vertices["height"].tolist(),
+        "color_map": vertices["color"].tolist(),
+        "ground_map": ground_map.tolist(),
     }
 
 
@@ -60,12 +51,12 @@ def write_mip(data, metadata):
 
     assert len(height_map) == len(color_map)
 
-    vertex_data = bytearray()
-    for height, color in zip(height_map, color_map):
-        vertex_data += struct.pack("<fI", height, color)  # float32, uint32
+    vertices = np.empty(len(height_map), dtype=VERTEX_DTYPE)
+    vertices["height"] = height_map
+    vertices["color"] = color_map
 
-    ground_data = struct.pack(f"<{len(ground_map)}q", *ground_map)  # q = int64
+    ground_data = np.asarray(ground_map, dtype="<i8")
 
-    full_data = vertex_data + ground_data
+    full_data = vertices.tobytes() + ground_data.tobytes()
 
     return full_data
@@ -1,15 +1,63 @@
+import lz4.block
+
 
 class SubCellData:
-    def __init__(self, data_type: str, data, meta_data, version):
+    def __init__(self, data_type: str, data, meta_data, version, decode_func=None):
         self.type = data_type
-        self.original_data = data
         self.version = version
-
-        self.data = None
         self.meta_data = meta_data
 
+        self._original_data = data
+        self._compressed_data = None  # Only set until the first decompression
+        self._decode_func = decode_func  # Only set until the first decode
+        self._data = None
+
+    @classmethod
+    def lazy(cls, data_type: str, compressed_data, meta_data, version, decode_func=None):
+        """ Sub cell that only decompresses / decodes its data the first time it is used """
+        sub_cell = cls(data_type, None, meta_data, version, decode_func)
+        sub_cell._compressed_data = compressed_data
+        return sub_cell
+
+    def load(self):
+        if self._compressed_data is not None:
+            try:
+                self._original_data = lz4.block.decompress(self._compressed_data, uncompressed_size=self.meta_data["size"])
+            except:
+                print("Error decompressing data", self.meta_data["index"], self.meta_data["size"], self.meta_data["compressed"], self.type)
+                raise
+
+            self._compressed_data = None  # Only the decompressed copy is kept
+
+        return self
+
+    @property
+    def original_data(self):
+        return self.load()._original_data
+
+    @original_data.setter
+    def original_data(self, value):
+        self._compressed_data = None
+        self._original_data = value
+
+    def ensure_decoded(self):
+        if self._decode_func is not None:
+            self.decode(self._decode_func)
+
+        return self
+
+    @property
+    def data(self):
+        return self.ensure_decoded()._data
+
+    @data.setter
+    def data(self, value):
+        self._decode_func = None
+        self._data = value
+
     def decode(self, decode_func):
-        self.data = decode_func(self.original_data, self.meta_data, self.version)
+        self._decode_func = None
+        self._data = decode_func(self.original_data, self.meta_data, self.version)
 
     def encode(self, encode_func=None):
         if not encode_func:
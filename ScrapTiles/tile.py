@@ -1,5 +1,10 @@
+import os
+import mmap
 import struct
 import lz4.block
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from .sub_tile import SubCellData
 
@@ -16,17 +21,80 @@ class bcolors:
     ENDC = '\033[0m'
 
 
+_HEADER_STRUCT = struct.Struct("<I I 16s Q I I I I I I I")
+
+# On-disk layout of a single cell header (388 bytes), see README "Cell Header"
+CELL_DTYPE = np.dtype([
+    ("mip_index", "<i4", 6), ("mip_compressed", "<i4", 6), ("mip_size", "<i4", 6),
+    ("clutter_index", "<i4"), ("clutter_compressed", "<i4"), ("clutter_size", "<i4"),
+    ("assets_count", "<i4", 4), ("assets_index", "<i4", 4), ("assets_compressed", "<i4", 4), ("assets_size", "<i4", 4),
+    ("blueprint_count", "<i4"), ("blueprint_index", "<i4"), ("blueprint_compressed", "<i4"), ("blueprint_size", "<i4"),
+    ("node_count", "<i4"), ("node_index", "<i4"), ("node_compressed", "<i4"), ("node_size", "<i4"),
+    ("script_count", "<i4"), ("script_index", "<i4"), ("script_compressed", "<i4"), ("script_size", "<i4"),
+    ("prefab_count", "<i4"), ("prefab_index", "<i4"), ("prefab_compressed", "<i4"), ("prefab_size", "<i4"),
+    ("decal_count", "<i4"), ("decal_index", "<i4"), ("decal_compressed", "<i4"), ("decal_size", "<i4"),
+    ("harvestable_count", "<i4", 4), ("harvestable_index", "<i4", 4), ("harvestable_compressed", "<i4", 4), ("harvestable_size", "<i4", 4),
+    ("kinematics_count", "<i4", 4), ("kinematics_index", "<i4", 4), ("kinematics_compressed", "<i4", 4), ("kinematics_size", "<i4", 4),
+    ("unknown_count", "<i4"), ("unknown_index", "<i4"), ("unknown_compressed", "<i4"), ("unknown_size", "<i4"),
+    ("voxel_terrain_count", "<i4"), ("voxel_terrain_index", "<i4"), ("voxel_terrain_compressed", "<i4"), ("voxel_terrain_size", "<i4"),
+])
+
+CELL_DATA_TYPES = (
+    "mip", "clutter", "assets", "blueprint", "node", "script", "prefab",
+    "decal", "harvestable", "kinematics", "unknown", "voxel_terrain",
+)
+
+
+def sub_cell_columns(cells, data_type):
+    """
+    Returns {"count", "index", "compressed", "size"} of data_type for every cell,
+    each as a (cell_count, sub_cell_count) view into cells. "count" is None for types without one.
+    """
+    columns = {}
+    for key in ("count", "index", "compressed", "size"):
+        name = f"{data_type}_{key}"
+        if name not in CELL_DTYPE.names:
+            columns[key] = None
+            continue
+
+        field_shape = CELL_DTYPE[name].shape  # () for a single sub cell, (n,) for several
+        columns[key] = cells[name].reshape(len(cells), field_shape[0] if field_shape else 1)
+
+    return columns
+
+
+# Chunks take a few microseconds to (de)compress, less than handing one to a thread.
+# So work is split into one batch per thread, and only when each batch gets at least this many items
+MIN_BATCH_SIZE = 256
+
+
+def map_batched(func, items, workers=None):
+    """ Same as [func(item) for item in items], spread over threads when there is enough work """
+    workers = min(workers or os.cpu_count() or 1, len(items) // MIN_BATCH_SIZE)
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    batch_size = -(-len(items) // workers)  # Round up, so there are at most `workers` batches
+    batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda batch: [func(item) for item in batch], batches)
+        return [result for batch in results for result in batch]
+
+
 class TileFile:
     MAGIC_KEY = 0x454C4954  # "TILE"
     CELL_HEADER_SIZE = 97
     CELL_DATA_SIZE = 388
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, quiet=False):
         self.file_path = file_path
+        self.quiet = quiet  # Hides the progress / info output
         self.header = None
-        self.cell_headers = []
+        self.cell_headers = np.zeros(0, dtype=CELL_DTYPE)  # One CELL_DTYPE record per cell
         self.world_data = []  # [cell_index][data_type][index]
-        self.original_data = None  # Store the original file data for reconstruction
+        self.original_data = None  # Input data, only kept while read_file is parsing it (mapped files are closed after)
+        self._mv = None  # memoryview of original_data, released once read_file returns
 
         self.read_write_functions = {
             "mip": (mip.read_mip, mip.write_mip),
@@ -36,35 +104,75 @@ class TileFile:
         if self.file_path:
             self.read_file()
 
-    def read_file(self, raw_input_bytes: bytes | bytearray | None =None):
+    def read_file(self, raw_input_bytes: bytes | bytearray | None =None, eager=False):
+        """
+        Loads the tile from file_path, or from raw_input_bytes if given.
+
+        - eager: Decompress and decode every sub cell now. By default each sub cell is only
+          decoded the first time its data is used.
+        """
         if not raw_input_bytes:
-            with open(self.file_path, "rb") as f:
-                self.original_data = f.read()
+            with open(self.file_path, "rb") as f:  # The mapping keeps its own handle, so the file can close now
+                self.original_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         else:
             self.original_data = raw_input_bytes
 
-        self.parse_header(self.original_data)
-        self.parse_cell_headers(self.original_data)
+        self._mv = memoryview(self.original_data)
 
-        for index, cell_header in enumerate(self.cell_headers):
-            cell_header_data = {}
-            for data_type in cell_header:
-                if data_type in self.read_write_functions:
-                    read_func, write_func = self.read_write_functions[data_type]
-                    cell_data = self.decode_cell_chunk(self.original_data, cell_header, data_type, read_func)
+        try:
+            self.parse_header(self.original_data)
+            self.parse_cell_headers(self.original_data)
+            self.parse_world_data(eager)
+        finally:
+            # Sub cells keep their own copy of their chunk, so nothing needs the file after this
+            self._release_input()
+
+        self._print(f"{bcolors.GOOD}[INFO] Loaded Tile. The following attributes are editable: {bcolors.ENDC}")
+        for read_write in self.read_write_functions:
+            self._print(f"{bcolors.GOOD} - {read_write}{bcolors.ENDC}")
+
+    def parse_world_data(self, eager=False):
+        columns = {}
+        for data_type in CELL_DATA_TYPES:
+            columns[data_type] = {
+                key: None if column is None else column.tolist()
+                for key, column in sub_cell_columns(self.cell_headers, data_type).items()
+            }
 
-                else:
-                    if index == 0:
-                        print(f"{bcolors.WARNING}[WARN] Modification disabled | No Read/Write functions for '{data_type}'{bcolors.ENDC}")
+        read_functions = {}
+        for data_type in CELL_DATA_TYPES:
+            read_func = self.read_write_functions.get(data_type, (None, None))[0]
+            read_functions[data_type] = read_func
 
-                    cell_data = self.decode_cell_chunk(self.original_data, cell_header, data_type, None)
+            if read_func is None:
+                self._print(f"{bcolors.WARNING}[WARN] Modification disabled | No Read/Write functions for '{data_type}'{bcolors.ENDC}")
 
-                cell_header_data[data_type] = cell_data
+        for index in range(len(self.cell_headers)):
+            cell_header_data = {}
+            for data_type in CELL_DATA_TYPES:
+                cell_header_data[data_type] = self.read_cell_chunk(index, columns[data_type], data_type, read_functions[data_type])
             self.world_data.append(cell_header_data)
 
-        print(f"{bcolors.GOOD}[INFO] Loaded Tile. The following attributes are editable: {bcolors.ENDC}")
-        for read_write in self.read_write_functions:
-            print(f"{bcolors.GOOD} - {read_write}{bcolors.ENDC}")
+        if eager:
+            sub_cells = self.get_sub_cells()
+            self.load_sub_cells(sub_cells)
+
+            # Parsing stays on this thread, the read functions are plain python
+            for sub_cell in sub_cells:
+                sub_cell.ensure_decoded()
+
+    def _print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
+
+    def _release_input(self):
+        if self._mv is not None:
+            self._mv.release()  # The mapping can't close while a view of it exists
+            self._mv = None
+
+        if isinstance(self.original_data, mmap.mmap):
+            self.original_data.close()
+            self.original_data = None
 
     @staticmethod
     def decode_colour(colour):
@@ -75,9 +183,20 @@ class TileFile:
 
         return red, green, blue, alpha
 
+    @staticmethod
+    def decode_colours(colours: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ Same as decode_colour, but for a whole uint32 array at once """
+        colours = np.asarray(colours, dtype=np.uint32)
+
+        alpha = ((colours >> 24) & 0xFF).astype(np.uint8)
+        red = ((colours >> 16) & 0xFF).astype(np.uint8)
+        green = ((colours >> 8) & 0xFF).astype(np.uint8)
+        blue = (colours & 0xFF).astype(np.uint8)
+
+        return red, green, blue, alpha
+
     def parse_header(self, data):
-        header_format = "<I I 16s Q I I I I I I I"
-        unpacked = struct.unpack_from(header_format, data, 0)
+        unpacked = _HEADER_STRUCT.unpack_from(data, 0)
 
         magic_key, version, uuid, creator_id, width, height, cell_header_offset, cell_header_size, some_val1, some_val2, v_type = unpacked
 
@@ -97,323 +216,246 @@ class TileFile:
             "type": v_type,
         }
 
-        print(f"{bcolors.GOOD}[INFO] Parsed Header. Tile Version: {version}{bcolors.ENDC}")
+        self._print(f"{bcolors.GOOD}[INFO] Parsed Header. Tile Version: {version}{bcolors.ENDC}")
 
     def parse_cell_headers(self, data):
         offset = self.header["cell_header_offset"]
         cell_size = self.header["cell_header_size"]
         cell_count = self.header["width"] * self.header["height"]
 
-        for _ in range(cell_count):
-            cell_data = data[offset:offset + cell_size]
-            cell_header = self.parse_cell_header(cell_data)
-            self.cell_headers.append(cell_header)
-            offset += cell_size
+        if cell_size != CELL_DTYPE.itemsize:
+            raise ValueError("Invalid .tile file: Cell Header size mismatch")
 
-    def parse_cell_header(self, cell_data):
-        cell_format = "<6i 6i 6i i i i 4i 4i 4i 4i i i i i i i i i i i i i i i i i i i i i 4i 4i 4i 4i 4i 4i 4i 4i 4i i i i i"
-        unpacked = struct.unpack(cell_format, cell_data)
+        # Copied so the headers can be edited and don't keep the input mapped
+        self.cell_headers = np.frombuffer(data, dtype=CELL_DTYPE, count=cell_count, offset=offset).copy()
+
+    def get_cell_header(self, cell_index):
+        """ Cell header as nested dicts, e.g. header["mip"]["index"][level] """
+        cell = self.cell_headers[cell_index]
+
+        header = {}
+        for data_type in CELL_DATA_TYPES:
+            header[data_type] = {}
+            for key in ("count", "index", "compressed", "size"):
+                name = f"{data_type}_{key}"
+                if name in CELL_DTYPE.names:
+                    value = cell[name].tolist()
+                    header[data_type][key] = tuple(value) if type(value) is list else value
+
+        return header
+
+    def get_sub_cells(self):
+        """ Every stored (non-empty) sub cell of every cell """
+        return [
+            sub_cell
+            for cell in self.world_data
+            for sub_cells in cell.values()
+            for sub_cell in sub_cells
+            if type(sub_cell) is not tuple
+        ]
 
-        if len(unpacked) != self.CELL_HEADER_SIZE:
-            print(len(unpacked))
-            raise ValueError("Invalid .tile file: Cell Header size mismatch")
+    @staticmethod
+    def load_sub_cells(sub_cells):
+        """ Decompresses the given sub cells, lz4 releases the GIL so large batches run in parallel """
+        map_batched(SubCellData.load, sub_cells)
 
-        return {
-            "mip": {  # 6x (no count)
-                "index": unpacked[0:6],
-                "compressed": unpacked[6:12],
-                "size": unpacked[12:18],
-            },
-
-            "clutter": {  # 1x (no count)
-                "index": unpacked[18],
-                "compressed": unpacked[19],
-                "size": unpacked[20],
-            },
-
-            "assets": {  # 4x
-                "count": unpacked[21:25],
-                "index": unpacked[25:29],
-                "compressed": unpacked[29:33],
-                "size": unpacked[33:37],
-            },
-
-            "blueprint": {  # 1x
-                "count": unpacked[37],
-                "index": unpacked[38],
-                "compressed": unpacked[39],
-                "size": unpacked[40],
-            },
-
-            "node": {
-                "count": unpacked[41],
-                "index": unpacked[42],
-                "compressed": unpacked[43],
-                "size": unpacked[44],
-            },
-
-            "script": {
-                "count": unpacked[45],
-                "index": unpacked[46],
-                "compressed": unpacked[47],
-                "size": unpacked[48],
-            },
-
-            "prefab": {
-                "count": unpacked[49],
-                "index": unpacked[50],
-                "compressed": unpacked[51],
-                "size": unpacked[52],
-            },
-
-            "decal": {
-                "count": unpacked[53],
-                "index": unpacked[54],
-                "compressed": unpacked[55],
-                "size": unpacked[56],
-            },
-
-            "harvestable": {
-                "count": unpacked[57:61],
-                "index": unpacked[61:65],
-                "compressed": unpacked[65:69],
-                "size": unpacked[69:73],
-            },
-
-            "kinematics": {
-                "count": unpacked[73:77],
-                "index": unpacked[77:81],
-                "compressed": unpacked[81:85],
-                "size": unpacked[85:89],
-            },
-
-            "unknown": {
-                "count": unpacked[89],
-                "index": unpacked[90],
-                "compressed": unpacked[91],
-                "size": unpacked[92],
-            },
-
-            "voxel_terrain": {
-                "count": unpacked[93],
-                "index": unpacked[94],
-                "compressed": unpacked[95],
-                "size": unpacked[96],
-            }
-        }
+    def read_cell_chunk(self, cell_index, columns, header_name, parse_function=None):
+        """ Returns the sub cells of header_name, each decoded the first time it is used """
+        counts = columns["count"][cell_index] if columns["count"] is not None else [None] * len(columns["index"][cell_index])
+        levels = zip(columns["index"][cell_index], columns["size"][cell_index], columns["compressed"][cell_index], counts)
 
-    def _decode_cell_chunk(self, data, index, size, compressed, count, header_name, parse_function):
-        if index <= 0 or compressed <= 0:
-            return index, size, compressed
+        sub_cells = []
+        for index, size, compressed, count in levels:
+            if index <= 0 or compressed <= 0:
+                sub_cells.append((index, size, compressed))
+                continue
 
-        compressed_data = data[index:index + compressed]
+            meta = {"index": index, "compressed": compressed, "size": size, "count": count}
+            sub_cells.append(SubCellData.lazy(header_name, bytes(self._mv[index:index + compressed]), meta, self.header["version"], parse_function))
+
+        return sub_cells
+
+    def write_header(self, buffer):
+        _HEADER_STRUCT.pack_into(
+            buffer, 0,
+            self.MAGIC_KEY,
+            self.header["version"],
+            bytes.fromhex(self.header["uuid"]),
+            self.header["creator_id"],
+            self.header["width"],
+            self.header["height"],
+            self.header["cell_header_offset"],
+            self.header["cell_header_size"],
+            self.header["some_val1"],
+            self.header["some_val2"],
+            self.header["type"],
+        )
+        return buffer
+
+    def build_file(self, buffer, data_blob_offset, data_blob_parts):
+        """ Writes the header, cell headers and compressed chunks into a buffer of the final file size """
+        self.write_header(buffer)
+
+        buffer[self.header["cell_header_offset"]:data_blob_offset] = self.cell_headers.tobytes()
+
+        offset = data_blob_offset
+        for compressed_cell_data in data_blob_parts:
+            buffer[offset:offset + len(compressed_cell_data)] = compressed_cell_data
+            offset += len(compressed_cell_data)
+
+    def __validate_write(self, new_data):
+        validate_failed = False
+        tile = None
 
         try:
-            decompressed_data = lz4.block.decompress(compressed_data, uncompressed_size=size)
-        except:
-            print("Error decompressing data", index, size, compressed, header_name)
-            raise
+            tile = TileFile(None, quiet=True)
+            tile.read_file(new_data, eager=True)
 
-        meta = {"index": index, "compressed": compressed, "size": size, "count": count}
-        sub_cell = SubCellData(header_name, decompressed_data, meta, self.header["version"])
+        except Exception as e:
+            validate_failed = True
 
-        if parse_function is not None:
-            sub_cell.decode(parse_function)
+            print(f"\n{bcolors.ERROR}[ERROR] Failed to validate data when writing!{bcolors.ENDC}")
+            print(f"{bcolors.ERROR}[ERROR] Caught Exception: {e}{bcolors.ENDC}")
+            print(f"{bcolors.BLUE}[DEBUG] Attempting Debug...")
 
-        return sub_cell
+            if tile and tile.header:
+                print("[DEBUG] Checking Header values...")
+                for key, value in tile.header.items():
+                    if self.header[key] != value:
+                        print(f"{bcolors.WARNING}[WARN] Header Mismatch: {key}. Expected: {self.header[key]}, Got: {value}{bcolors.BLUE}")
 
-    def decode_cell_chunk(self, data, cell_header, header_name, parse_function=None):
-        cell_header_data = cell_header[header_name]
+                print("[DEBUG] Checking Cell Index / Sizes For Mismatching...")
 
-        sub_cells = []
+                if len(tile.cell_headers) == len(self.cell_headers):
+                    for key in CELL_DATA_TYPES:
+                        loaded_columns = sub_cell_columns(tile.cell_headers, key)
+                        true_columns = sub_cell_columns(self.cell_headers, key)
 
-        if type(cell_header_data["index"]) is tuple:
-            for level in range(len(cell_header_data["index"])):
-                index = cell_header_data["index"][level]
-                size = cell_header_data["size"][level]
-                compressed_size = cell_header_data["compressed"][level]
-                count = None if "count" not in cell_header_data else cell_header_data["count"][level]
+                        chunk_is_invalid = np.zeros(len(tile.cell_headers), dtype=bool)
+                        for sub_key, column in loaded_columns.items():
+                            if column is not None:
+                                chunk_is_invalid |= (column != true_columns[sub_key]).any(axis=1)
 
-                sub_cells.append(
-                    self._decode_cell_chunk(data, index, size, compressed_size, count, header_name, parse_function)
-                )
+                        for cell_index in np.flatnonzero(chunk_is_invalid):
+                            print(f"{bcolors.WARNING}[WARN] Cell Header Mismatch! -> Cell: {cell_index}, Field: {key}, Loaded: {tile.get_cell_header(cell_index)[key]}{bcolors.BLUE}")
 
-        else:
-            index = cell_header_data["index"]
-            size = cell_header_data["size"]
-            compressed_size = cell_header_data["compressed"]
-            count = None if "count" not in cell_header_data else cell_header_data["count"]
+                else:
+                    print(f"{bcolors.WARNING}[WARN] Cell Count Mismatch! Expected: {len(self.cell_headers)}, Got: {len(tile.cell_headers)}{bcolors.BLUE}")
 
-            sub_cells.append(
-                self._decode_cell_chunk(data, index, size, compressed_size, count, header_name, parse_function)
-            )
+                if len(tile.cell_headers) == 0:  # Failed before the cell headers were read
+                    print("[DEBUG] No Cell Headers Loaded, Skipping Overflow Check...")
 
-        return sub_cells
+                else:
+                    print("[DEBUG] Checking Cell Index / Sizes For Overflow...")
 
-    def write_header(self, new_data):
-        new_data += struct.pack("<I", self.MAGIC_KEY)
-        new_data += struct.pack("<I", self.header["version"])
-        new_data += struct.pack("<16s", bytes.fromhex(self.header["uuid"]))
-        new_data += struct.pack("<Q", self.header["creator_id"])
-        new_data += struct.pack("<I", self.header["width"])
-        new_data += struct.pack("<I", self.header["height"])
-        new_data += struct.pack("<I", self.header["cell_header_offset"])
-        new_data += struct.pack("<I", self.header["cell_header_size"])
-        new_data += struct.pack("<I", self.header["some_val1"])
-        new_data += struct.pack("<I", self.header["some_val2"])
-        new_data += struct.pack("<I", self.header["type"])
-        return new_data
+                    for key in CELL_DATA_TYPES:
+                        columns = sub_cell_columns(tile.cell_headers, key)
+                        last = columns["index"].astype(np.int64) + columns["compressed"] - 1
 
-    @staticmethod
-    def create_cell_header(header):
-        cell_data = [
-            header["mip"]["index"][0], header["mip"]["index"][1], header["mip"]["index"][2], header["mip"]["index"][3], header["mip"]["index"][4], header["mip"]["index"][5],
-            header["mip"]["compressed"][0], header["mip"]["compressed"][1], header["mip"]["compressed"][2], header["mip"]["compressed"][3], header["mip"]["compressed"][4], header["mip"]["compressed"][5],
-            header["mip"]["size"][0], header["mip"]["size"][1], header["mip"]["size"][2], header["mip"]["size"][3], header["mip"]["size"][4], header["mip"]["size"][5],
-
-            header["clutter"]["index"],
-            header["clutter"]["compressed"],
-            header["clutter"]["size"],
-
-            header["assets"]["count"][0], header["assets"]["count"][1], header["assets"]["count"][2], header["assets"]["count"][3],
-            header["assets"]["index"][0], header["assets"]["index"][1], header["assets"]["index"][2], header["assets"]["index"][3],
-            header["assets"]["compressed"][0], header["assets"]["compressed"][1], header["assets"]["compressed"][2], header["assets"]["compressed"][3],
-            header["assets"]["size"][0], header["assets"]["size"][1], header["assets"]["size"][2], header["assets"]["size"][3],
-
-            header["blueprint"]["count"],
-            header["blueprint"]["index"],
-            header["blueprint"]["compressed"],
-            header["blueprint"]["size"],
-
-            header["node"]["count"],
-            header["node"]["index"],
-            header["node"]["compressed"],
-            header["node"]["size"],
-
-            header["script"]["count"],
-            header["script"]["index"],
-            header["script"]["compressed"],
-            header["script"]["size"],
-
-            header["prefab"]["count"],
-            header["prefab"]["index"],
-            header["prefab"]["compressed"],
-            header["prefab"]["size"],
-
-            header["decal"]["count"],
-            header["decal"]["index"],
-            header["decal"]["compressed"],
-            header["decal"]["size"],
-
-            header["harvestable"]["count"][0], header["harvestable"]["count"][1], header["harvestable"]["count"][2], header["harvestable"]["count"][3],
-            header["harvestable"]["index"][0], header["harvestable"]["index"][1], header["harvestable"]["index"][2], header["harvestable"]["index"][3],
-            header["harvestable"]["compressed"][0], header["harvestable"]["compressed"][1], header["harvestable"]["compressed"][2], header["harvestable"]["compressed"][3],
-            header["harvestable"]["size"][0], header["harvestable"]["size"][1], header["harvestable"]["size"][2], header["harvestable"]["size"][3],
-
-            header["kinematics"]["count"][0], header["kinematics"]["count"][1], header["kinematics"]["count"][2], header["kinematics"]["count"][3],
-            header["kinematics"]["index"][0], header["kinematics"]["index"][1], header["kinematics"]["index"][2], header["kinematics"]["index"][3],
-            header["kinematics"]["compressed"][0], header["kinematics"]["compressed"][1], header["kinematics"]["compressed"][2], header["kinematics"]["compressed"][3],
-            header["kinematics"]["size"][0], header["kinematics"]["size"][1], header["kinematics"]["size"][2], header["kinematics"]["size"][3],
-
-            header["unknown"]["count"],
-            header["unknown"]["index"],
-            header["unknown"]["compressed"],
-            header["unknown"]["size"],
-
-            header["voxel_terrain"]["count"],
-            header["voxel_terrain"]["index"],
-            header["voxel_terrain"]["compressed"],
-            header["voxel_terrain"]["size"]
-        ]
+                        for cell_index, level in np.argwhere(last >= len(new_data)):
+                            print(f"{bcolors.WARNING}[WARN] Cell Header Overflow! -> Cell: {cell_index}, Field: {key}. DEBUG: {last[cell_index, level]}, {len(new_data)}. {bcolors.BLUE}")
+
+                print(f"{bcolors.ENDC}", end="")
+
+            else:
+                print("[DEBUG] Tile Init Failed")
 
-        cell_format = "<6i 6i 6i i i i 4i 4i 4i 4i i i i i i i i i i i i i i i i i i i i i 4i 4i 4i 4i 4i 4i 4i 4i 4i i i i i"
-        return struct.pack(cell_format, *cell_data)
+        return not validate_failed
 
-    def write_file(self, output_file_path):
-        print(f"{bcolors.GOOD}[INFO] Creating Tile Header... {bcolors.ENDC}", end="")
-        new_data = self.write_header(b"")
+    def write_file(self, output_file_path, compression_level: int | None = None, validate=False) -> bool:
+        """
+        Rebuilds the tile from world_data and saves it to output_file_path.
 
-        if len(new_data) != self.header["cell_header_offset"]:
+        - compression_level: None uses LZ4's fast mode. Passing a level (1-12) switches to
+          high compression, giving slightly smaller files but saving up to ~10x slower.
+        - validate: Re-reads the new data before saving and refuses to save if it fails to load.
+        """
+        if _HEADER_STRUCT.size != self.header["cell_header_offset"]:
             raise ValueError("Header offset is incorrect, I have no setup for this :)")
 
         sub_cell_count = 0
-        for i, _ in enumerate(self.cell_headers):
+        for i in range(len(self.cell_headers)):
             for j in self.world_data[i]:
                 for _ in self.world_data[i][j]:
                     sub_cell_count += 1
 
-        print(f"\r{bcolors.GOOD}[INFO] Blocking Space... {bcolors.ENDC}", end="")
+        # The data blob starts straight after the cell headers
+        data_blob_offset = self.header["cell_header_offset"] + (self.CELL_DATA_SIZE * len(self.cell_headers))
+        data_blob_parts = []
+        data_blob_len = 0
 
-        # block out cell header space
-        new_data += ("X" * (self.CELL_DATA_SIZE * len(self.cell_headers))).encode()
+        if compression_level is None:
+            compress_args = {"mode": "default"}
+        else:
+            compress_args = {"mode": "high_compression", "compression": compression_level}
 
-        data_blob_offset = len(new_data)
-        data_blob = b""
+        # Encoding needs every sub cell decompressed, which can happen in parallel up front
+        self.load_sub_cells(self.get_sub_cells())
 
+        # Encoding runs the python write functions, so keep it on this thread
+        jobs = []  # (cell_index, data_type, sub_cell_index, raw_size)
+        raw_chunks = []  # Encoded data of each job, only kept until it is compressed
         sub_cells_processed = 0
-        print(f"\r{bcolors.GOOD}[INFO] Processing... (0/{sub_cell_count}){bcolors.ENDC}", end="")
-        for cell_index, cell_header in enumerate(self.cell_headers):
+        encode_functions = {data_type: self.read_write_functions.get(data_type, (None, None))[1] for data_type in CELL_DATA_TYPES}
+
+        self._print(f"\r{bcolors.GOOD}[INFO] Processing... (0/{sub_cell_count}){bcolors.ENDC}", end="")
+        for cell_index in range(len(self.cell_headers)):
             for data_type in self.world_data[cell_index]:
                 for sub_cell_index, sub_cell in enumerate(self.world_data[cell_index][data_type]):
                     if type(sub_cell) is not tuple:
-                        multiple_sub_cells = type(cell_header[data_type]["index"]) is not int
-
-                        encode_func = None
-                        if data_type in self.read_write_functions:
-                            encode_func = self.read_write_functions[data_type][1]
-
-                        raw_sub_cell_data = sub_cell.encode(encode_func)
-                        compressed_cell_data = lz4.block.compress(raw_sub_cell_data, mode="high_compression", store_size=False)
-
-                        if multiple_sub_cells:
-                            if type(cell_header[data_type]["index"]) is tuple:
-                                cell_header[data_type]["index"] = list(cell_header[data_type]["index"])
-
-                            if type(cell_header[data_type]["compressed"]) is tuple:
-                                cell_header[data_type]["compressed"] = list(cell_header[data_type]["compressed"])
-
-                            if type(cell_header[data_type]["size"]) is tuple:
-                                cell_header[data_type]["size"] = list(cell_header[data_type]["size"])
-
-                            cell_header[data_type]["index"][sub_cell_index] = len(data_blob) + data_blob_offset
-                            cell_header[data_type]["compressed"][sub_cell_index] = len(compressed_cell_data)
-                            cell_header[data_type]["size"][sub_cell_index] = len(raw_sub_cell_data)
-
-                        else:
-                            cell_header[data_type]["index"] = len(data_blob) + data_blob_offset
-                            cell_header[data_type]["compressed"] = len(compressed_cell_data)
-                            cell_header[data_type]["size"] = len(raw_sub_cell_data)
-
-                        data_blob += compressed_cell_data
+                        raw_chunks.append(sub_cell.encode(encode_functions[data_type]))
+                        jobs.append((cell_index, data_type, sub_cell_index, len(raw_chunks[-1])))
 
                     sub_cells_processed += 1
 
-            header_data = self.create_cell_header(cell_header)
+            self._print(f"\r{bcolors.GOOD}[INFO] Processing... ({sub_cells_processed}/{sub_cell_count}){bcolors.ENDC}", end="")
+
+        self._print(f"\r{bcolors.GOOD}[INFO] Compressing... {bcolors.ENDC}", end="")
 
-            if len(header_data) != self.CELL_DATA_SIZE:
-                raise ValueError(f"Header data is invalid size! ({len(header_data)}) / ({self.CELL_DATA_SIZE}) ")
+        # lz4 releases the GIL, so large batches compress in parallel
+        compress = partial(lz4.block.compress, store_size=False, **compress_args)
+        compressed_chunks = map_batched(compress, raw_chunks)
+        del raw_chunks
 
+        # (index, compressed, size) columns of each data type, all shaped (cell_count, sub_cell_count)
+        header_fields = {}
+        for data_type in CELL_DATA_TYPES:
+            columns = sub_cell_columns(self.cell_headers, data_type)
+            header_fields[data_type] = (columns["index"], columns["compressed"], columns["size"])
 
-            start = self.header["cell_header_offset"] + (self.CELL_DATA_SIZE * cell_index)
-            end = (start + self.CELL_DATA_SIZE)
+        for (cell_index, data_type, sub_cell_index, raw_size), compressed_cell_data in zip(jobs, compressed_chunks):
+            index_field, compressed_field, size_field = header_fields[data_type]
 
-            if len(header_data) != end - start:
-                raise ValueError(f"Header Data Does not match the cell size {len(header_data)}/{end - start}")
+            index_field[cell_index, sub_cell_index] = data_blob_len + data_blob_offset
+            compressed_field[cell_index, sub_cell_index] = len(compressed_cell_data)
+            size_field[cell_index, sub_cell_index] = raw_size
 
-            if end > len(new_data):
-                raise ValueError(f"Invalid Header Index (Out of bounds). Index: {end}, Max: {len(new_data)}")
+            data_blob_parts.append(compressed_cell_data)
+            data_blob_len += len(compressed_cell_data)
 
-            new_data = new_data[:start] + header_data + new_data[end:]
+        file_size = data_blob_offset + data_blob_len
 
-            print(f"\r{bcolors.GOOD}[INFO] Processing... ({sub_cells_processed}/{sub_cell_count}){bcolors.ENDC}", end="")
+        if validate:
+            self._print(f"\r{bcolors.GOOD}[INFO] Building File... {bcolors.ENDC}", end="")
+            new_data = bytearray(file_size)
+            self.build_file(new_data, data_blob_offset, data_blob_parts)
 
+            if not self.__validate_write(new_data):
+                self._print(f"\r{bcolors.WARNING}[WARN] Failed to write file. Validation Failed!{bcolors.ENDC}")
+                return False
 
-        new_data += data_blob
+        self._print(f"\r{bcolors.GOOD}[INFO] Writing to... {output_file_path}{bcolors.ENDC}", end="")
+        with open(output_file_path, "wb+") as f:
+            if validate:
+                f.write(new_data)
 
-        print(f"\r{bcolors.GOOD}[INFO] Writing to... {output_file_path}{bcolors.ENDC}", end="")
-        with open(output_file_path, "wb") as f:
-            f.write(new_data)
+            else:  # Build straight into the file, so the tile is never held in memory twice
+                f.truncate(file_size)
+                with mmap.mmap(f.fileno(), file_size) as new_data:
+                    self.build_file(new_data, data_blob_offset, data_blob_parts)
+                    new_data.flush()
 
-        print(f"\r{bcolors.GOOD}[INFO] Saved to '{output_file_path}'{bcolors.ENDC}")
+        self._print(f"\r{bcolors.GOOD}[INFO] Saved to '{output_file_path}'{bcolors.ENDC}")
+        return True
 
 
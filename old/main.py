@@ -1,8 +1,6 @@
 import struct
 import lz4.block
-import numpy as np
 
-from readwrite import voxel_terrain
 from readwrite import mip as readwrite_mip
 
 
@@ -37,8 +35,9 @@ class TileFile:
     CELL_HEADER_SIZE = 97
     CELL_DATA_SIZE = 388
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, quiet=False):
         self.file_path = file_path
+        self.quiet = quiet  # Hides the progress / info output
         self.header = None
         self.cell_headers = []
         self.world_data = []  # [cell_index][data_type][index]
@@ -69,16 +68,20 @@ class TileFile:
 
                 else:
                     if index == 0:
-                        print(f"{bcolors.WARNING}[WARN] Modification disabled | No Read/Write functions for '{data_type}'{bcolors.ENDC}")
+                        self._print(f"{bcolors.WARNING}[WARN] Modification disabled | No Read/Write functions for '{data_type}'{bcolors.ENDC}")
 
                     cell_data = self.decode_cell_chunk(self.original_data, cell_header, data_type, None)
 
                 cell_header_data[data_type] = cell_data
             self.world_data.append(cell_header_data)
 
-        print(f"{bcolors.GOOD}[INFO] Loaded Tile. The following attributes are editable: {bcolors.ENDC}")
+        self._print(f"{bcolors.GOOD}[INFO] Loaded Tile. The following attributes are editable: {bcolors.ENDC}")
         for read_write in self.read_write_functions:
-            print(f"{bcolors.GOOD} - {read_write}{bcolors.ENDC}")
+            self._print(f"{bcolors.GOOD} - {read_write}{bcolors.ENDC}")
+
+    def _print(self, *args, **kwargs):
+        if not self.quiet:
+            print(*args, **kwargs)
 
     @staticmethod
     def decode_colour(colour):
@@ -111,7 +114,7 @@ class TileFile:
             "type": v_type,
         }
 
-        print(f"{bcolors.GOOD}[INFO] Parsed Header. Tile Version: {version}{bcolors.ENDC}")
+        self._print(f"{bcolors.GOOD}[INFO] Parsed Header. Tile Version: {version}{bcolors.ENDC}")
 
     def parse_cell_headers(self, data):
         offset = self.header["cell_header_offset"]
@@ -223,9 +226,6 @@ class TileFile:
 
         compressed_data = data[index:index + compressed]
 
-        if index == 99388:
-            print(compressed_data)
-
         try:
             decompressed_data = lz4.block.decompress(compressed_data, uncompressed_size=size)
         except:
@@ -351,21 +351,13 @@ class TileFile:
         validate_failed = False
         tile = None
 
-        def fake_print(*args, **kwargs):
-            return
-
-        default_print = print
-
         try:
-            __builtins__.print = fake_print
-            tile = TileFile(None)
+            tile = TileFile(None, quiet=True)
             tile.DEBUG = True
             tile.read_file(new_data)
-            __builtins__.print = default_print
 
         except Exception as e:
             validate_failed = True
-            __builtins__.print = default_print
 
             print(f"\n{bcolors.ERROR}[ERROR] Failed to validate data when writing!{bcolors.ENDC}")
             print(f"{bcolors.ERROR}[ERROR] Caught Exception: {e}{bcolors.ENDC}")
@@ -423,7 +415,7 @@ class TileFile:
         return not validate_failed
 
     def write_file(self, output_file_path, validate=False) -> bool:
-        print(f"{bcolors.GOOD}[INFO] Creating Tile Header... {bcolors.ENDC}", end="")
+        self._print(f"{bcolors.GOOD}[INFO] Creating Tile Header... {bcolors.ENDC}", end="")
         new_data = self.write_header(b"")
 
         if len(new_data) != self.header["cell_header_offset"]:
@@ -435,16 +427,16 @@ class TileFile:
                 for _ in self.world_data[i][j]:
                     sub_cell_count += 1
 
-        print(f"\r{bcolors.GOOD}[INFO] Blocking Space... {bcolors.ENDC}", end="")
+        self._print(f"\r{bcolors.GOOD}[INFO] Blocking Space... {bcolors.ENDC}", end="")
 
         # block out cell header space
-        new_data += ("X" * (self.CELL_DATA_SIZE * len(self.cell_headers))).encode()
+        new_data += bytes(self.CELL_DATA_SIZE * len(self.cell_headers))
 
         data_blob_offset = len(new_data)
         data_blob = b""
 
         sub_cells_processed = 0
-        print(f"\r{bcolors.GOOD}[INFO] Processing... (0/{sub_cell_count}){bcolors.ENDC}", end="")
+        self._print(f"\r{bcolors.GOOD}[INFO] Processing... (0/{sub_cell_count}){bcolors.ENDC}", end="")
         for cell_index, cell_header in enumerate(self.cell_headers):
             for data_type in self.world_data[cell_index]:
                 for sub_cell_index, sub_cell in enumerate(self.world_data[cell_index][data_type]):
@@ -498,20 +490,20 @@ class TileFile:
 
             new_data = new_data[:start] + header_data + new_data[end:]
 
-            print(f"\r{bcolors.GOOD}[INFO] Processing... ({sub_cells_processed}/{sub_cell_count}){bcolors.ENDC}", end="")
+            self._print(f"\r{bcolors.GOOD}[INFO] Processing... ({sub_cells_processed}/{sub_cell_count}){bcolors.ENDC}", end="")
 
 
         new_data += data_blob
 
         if validate is False or self.__validate_write(new_data):
-            print(f"\r{bcolors.GOOD}[INFO] Writing to... {output_file_path}{bcolors.ENDC}", end="")
+            self._print(f"\r{bcolors.GOOD}[INFO] Writing to... {output_file_path}{bcolors.ENDC}", end="")
             with open(output_file_path, "wb") as f:
                 f.write(new_data)
 
-            print(f"\r{bcolors.GOOD}[INFO] Saved to '{output_file_path}'{bcolors.ENDC}")
+            self._print(f"\r{bcolors.GOOD}[INFO] Saved to '{output_file_path}'{bcolors.ENDC}")
             return True
         else:
-            print(f"\r{bcolors.WARNING}[WARN] Failed to write file. Validation Failed!{bcolors.ENDC}")
+            self._print(f"\r{bcolors.WARNING}[WARN] Failed to write file. Validation Failed!{bcolors.ENDC}")
             return False
 
 